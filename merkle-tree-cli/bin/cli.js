@@ -12,7 +12,8 @@ program
     .option('-d, --directory <dir>', 'directory to build Merkle Tree from file contents')
     .option('-o, --output-file <file>', 'output file to save the Merkle Tree JSON')
     .option('-p, --pretty', 'pretty-print JSON output')
-    .option('-v, --verify <data>', 'verify if a data block or file is in the tree')
+    .option('-v, --verify <data>', 'verify if a data block or file is in the tree (prints only root and proof unless -o is given)')
+    .option('-j, --jobs <n>', 'number of files hashed concurrently and max worker threads (default: available CPUs)', value => parseInt(value, 10))
     .action((data, options) => {
         // console.log('data:', data);
         // console.log('opts:', options);
@@ -1,7 +1,8 @@
 const path = require('path');
 const { buildMerkleTree } = require('./merkleTree');
 const { generateMerkleProof, verifyMerkleProof } = require('./proof');
-const { getFilesInDirectory, readDataBlocks, writeOutputFile } = require('./fileUtils');
+const { getFilesInDirectory, readDataBlocks, writeTree, writeTreeFile } = require('./fileUtils');
+const { hashReplacer } = require('./hashing');
 
 /**
  * Handle CLI commands
@@ -26,29 +27,44 @@ async function handleCli(options) {
         // Handle file input
         if (options.inputFile) {
             const fileBlocks = await readDataBlocks(options.inputFile);
-            dataBlocks = dataBlocks.concat(fileBlocks);
+            // With -d the lines are file paths; only data blocks stay raw bytes
+            dataBlocks = dataBlocks.concat(isFilePaths
+                ? fileBlocks.map(block => block.toString('utf8'))
+                : fileBlocks);
         }
 
         if (dataBlocks.length === 0) {
             throw new Error('No data blocks or files provided');
         }
 
+        if (options.jobs !== undefined && !(Number.isInteger(options.jobs) && options.jobs > 0)) {
+            throw new Error('--jobs must be a positive integer');
+        }
+
+        // File digests from the build are reused by --verify within this run only
+        const hashCache = new Map();
+
         // Build Merkle Tree
-        const { root, treeLevels } = await buildMerkleTree(dataBlocks, isFilePaths);
-        if (!root) {
+        const { rootHash, treeLevels } = await buildMerkleTree(dataBlocks, isFilePaths, {
+            jobs: options.jobs,
+            hashCache
+        });
+        if (!rootHash) {
             throw new Error('Failed to build Merkle Tree');
         }
 
-        // Output results
+        // Output results, streamed straight from the packed levels. With
+        // --verify and no output file only the root and proof are printed.
         if (options.outputFile) {
-            await writeOutputFile(options.outputFile, root, options.pretty);
+            await writeTreeFile(options.outputFile, treeLevels, dataBlocks, isFilePaths, options.pretty);
             console.log(`Merkle Tree saved to ${options.outputFile}`);
-        } else {
+        } else if (!options.verify) {
             console.log('Merkle Tree:');
-            console.log(JSON.stringify(root, null, options.pretty ? 2 : null));
+            await writeTree(process.stdout, treeLevels, dataBlocks, isFilePaths, options.pretty);
+            process.stdout.write('\n');
         }
 
-        console.log('\nMerkle Root:', root.hash);
+        console.log('\nMerkle Root:', rootHash.toString('hex'));
 
         // Handle verification
         if (options.verify) {
@@ -56,7 +72,8 @@ async function handleCli(options) {
                 options.verify, 
                 dataBlocks, 
                 treeLevels, 
-                isFilePaths
+                isFilePaths,
+                hashCache
             );
 
             if (!proof) {
@@ -65,12 +82,13 @@ async function handleCli(options) {
                 const isValid = await verifyMerkleProof(
                     options.verify, 
                     proof, 
-                    root.hash, 
-                    isFilePaths
+                    rootHash, 
+                    isFilePaths,
+                    hashCache
                 );
                 
                 console.log(`\nVerification for '${options.verify}': ${isValid ? 'VALID' : 'INVALID'}`);
-                console.log('Merkle Proof:', JSON.stringify(proof, null, options.pretty ? 2 : null));
+                console.log('Merkle Proof:', JSON.stringify(proof, hashReplacer, options.pretty ? 2 : null));
             }
         }
     } catch (error) {
@@ -1,6 +1,9 @@
 const fs = require('fs');
 const path = require('path');
 const { promisify } = require('util');
+const { isUtf8 } = require('buffer');
+const { pipeline } = require('stream/promises');
+const { treeJsonChunks } = require('./merkleTree');
 
 const readdir = promisify(fs.readdir);
 const stat = promisify(fs.stat);
@@ -28,17 +31,93 @@ async function getFilesInDirectory(dir) {
     return files.sort(); // Consistent ordering
 }
 
+/**
+ * Whether three bytes are the UTF-8 encoding of a non-ASCII whitespace code
+ * point that String.prototype.trim strips: U+1680, U+2000-U+200A, U+2028,
+ * U+2029, U+202F, U+205F, U+3000 or U+FEFF
+ * @param {number} b0 - Lead byte
+ * @param {number} b1 - Second byte
+ * @param {number} b2 - Third byte
+ * @returns {boolean}
+ */
+function isWideSpace(b0, b1, b2) {
+    switch (b0) {
+        case 0xe1: return b1 === 0x9a && b2 === 0x80;
+        case 0xe2: return (b1 === 0x80 && ((b2 >= 0x80 && b2 <= 0x8a) || b2 === 0xa8 || b2 === 0xa9 || b2 === 0xaf))
+            || (b1 === 0x81 && b2 === 0x9f);
+        case 0xe3: return b1 === 0x80 && b2 === 0x80;
+        case 0xef: return b1 === 0xbb && b2 === 0xbf;
+        default: return false;
+    }
+}
+
+/**
+ * Byte length of the whitespace character starting at `lo`, or 0
+ * @param {Buffer} buf - Valid UTF-8 bytes
+ * @param {number} lo - Start offset
+ * @param {number} hi - End offset (exclusive)
+ * @returns {number}
+ */
+function leadingSpaceLength(buf, lo, hi) {
+    const b0 = buf[lo];
+    if (b0 === 0x20 || (b0 >= 0x09 && b0 <= 0x0d)) return 1;
+    if (hi - lo >= 2 && b0 === 0xc2 && buf[lo + 1] === 0xa0) return 2; // U+00A0
+    if (hi - lo >= 3 && isWideSpace(b0, buf[lo + 1], buf[lo + 2])) return 3;
+    return 0;
+}
+
+/**
+ * Byte length of the whitespace character ending at `hi`, or 0
+ * @param {Buffer} buf - Valid UTF-8 bytes
+ * @param {number} lo - Start offset
+ * @param {number} hi - End offset (exclusive)
+ * @returns {number}
+ */
+function trailingSpaceLength(buf, lo, hi) {
+    const last = buf[hi - 1];
+    if (last === 0x20 || (last >= 0x09 && last <= 0x0d)) return 1;
+    if (hi - lo >= 2 && buf[hi - 2] === 0xc2 && last === 0xa0) return 2; // U+00A0
+    if (hi - lo >= 3 && isWideSpace(buf[hi - 3], buf[hi - 2], last)) return 3;
+    return 0;
+}
+
 /**
  * Read data blocks from file
  * @param {string} filePath - Input file path
- * @returns {Promise<string[]>} Array of data blocks
+ * @returns {Promise<Array<Buffer|string>>} Array of data blocks (raw UTF-8 bytes, hashed as-is)
  */
 async function readDataBlocks(filePath) {
     try {
-        const content = await fs.promises.readFile(filePath, 'utf-8');
-        return content.split('\n')
-            .map(line => line.trim())
-            .filter(line => line.length > 0); // empty line filter
+        const content = await fs.promises.readFile(filePath);
+
+        // Invalid UTF-8 is replaced with U+FFFD when decoded, so hash the decoded text
+        if (!isUtf8(content)) {
+            return content.toString('utf-8').split('\n')
+                .map(line => line.trim())
+                .filter(line => line.length > 0); // empty line filter
+        }
+
+        const blocks = [];
+        let start = 0;
+
+        while (start < content.length) {
+            let end = content.indexOf(0x0a, start);
+            if (end === -1) end = content.length;
+
+            // Trim each line exactly as String#trim would; empty lines are dropped
+            let lo = start;
+            let hi = end;
+            let n;
+            while (lo < hi && (n = leadingSpaceLength(content, lo, hi)) > 0) lo += n;
+            while (hi > lo && (n = trailingSpaceLength(content, lo, hi)) > 0) hi -= n;
+            if (hi > lo) {
+                blocks.push(content.subarray(lo, hi));
+            }
+
+            start = end + 1;
+        }
+
+        return blocks;
     } catch (error) {
         throw new Error(`File read error: ${error.message}`);
     }
@@ -60,8 +139,47 @@ async function writeOutputFile(filePath, data, pretty = false) {
     }
 }
 
+/**
+ * Stream the Merkle Tree JSON to a writable stream
+ * @param {Writable} stream - Destination stream (left open when done)
+ * @param {Buffer[]} treeLevels - Packed tree levels
+ * @param {Array<string|Buffer>} items - Original data blocks or file paths
+ * @param {boolean} [isFilePaths=false] - Whether items are file paths
+ * @param {boolean} [pretty=false] - Pretty-print JSON
+ * @returns {Promise<void>}
+ */
+async function writeTree(stream, treeLevels, items, isFilePaths = false, pretty = false) {
+    try {
+        await pipeline(treeJsonChunks(treeLevels, items, isFilePaths, pretty), stream, { end: false });
+    } catch (error) {
+        throw new Error(`File write error: ${error.message}`);
+    }
+}
+
+/**
+ * Stream the Merkle Tree JSON to a file
+ * @param {string} filePath - Output file path
+ * @param {Buffer[]} treeLevels - Packed tree levels
+ * @param {Array<string|Buffer>} items - Original data blocks or file paths
+ * @param {boolean} [isFilePaths=false] - Whether items are file paths
+ * @param {boolean} [pretty=false] - Pretty-print JSON
+ * @returns {Promise<void>}
+ */
+async function writeTreeFile(filePath, treeLevels, items, isFilePaths = false, pretty = false) {
+    try {
+        await pipeline(
+            treeJsonChunks(treeLevels, items, isFilePaths, pretty),
+            fs.createWriteStream(filePath, { highWaterMark: 1024 * 1024 })
+        );
+    } catch (error) {
+        throw new Error(`File write error: ${error.message}`);
+    }
+}
+
 module.exports = {
     getFilesInDirectory,
     readDataBlocks,
-    writeOutputFile
+    writeOutputFile,
+    writeTree,
+    writeTreeFile
 };
\ No newline at end of file
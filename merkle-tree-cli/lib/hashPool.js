@@ -0,0 +1,142 @@
+const os = require('os');
+const path = require('path');
+const { Worker } = require('worker_threads');
+const { hashPairs } = require('./hashing');
+
+// Starting a worker costs ~25-30 ms while one pair hashes inline in ~1-2.5 us,
+// and the CLI builds once per process. Below ~128k nodes the spawn cost
+// outweighs what even a 4-core split saves, so such levels stay inline.
+const PARALLEL_THRESHOLD = 128 * 1024;
+
+// CPUs this process may actually use (respects affinity), not host CPUs
+const poolSize = typeof os.availableParallelism === 'function'
+    ? os.availableParallelism()
+    : os.cpus().length;
+let workers = null;
+let nextTaskId = 0;
+
+/**
+ * Start one pool worker
+ * @param {number} index - Slot in the pool
+ * @returns {{worker: Worker, pending: Map}} Worker and its in-flight tasks by id
+ */
+function spawnWorker(index) {
+    const worker = new Worker(path.join(__dirname, 'hashWorker.js'));
+    const entry = { worker, pending: new Map() };
+
+    worker.on('message', ({ id }) => {
+        const task = entry.pending.get(id);
+        if (!task) return;
+        entry.pending.delete(id);
+        if (entry.pending.size === 0) {
+            worker.unref();
+        }
+        task.resolve();
+    });
+
+    // A failed worker has exited: fail its tasks and free the slot for a replacement
+    const fail = error => {
+        if (workers[index] === entry) {
+            workers[index] = null;
+        }
+        for (const task of entry.pending.values()) {
+            task.reject(error);
+        }
+        entry.pending.clear();
+    };
+    worker.on('error', fail);
+    worker.on('exit', code => fail(new Error(`Hash worker exited with code ${code}`)));
+
+    worker.unref();
+    return entry;
+}
+
+/**
+ * Lazily start pool workers, replacing any that have failed
+ * @param {number} count - Number of workers needed (at most poolSize)
+ * @returns {object[]} Pool entries, unref'd while idle so they never hold the process open
+ */
+function getWorkers(count) {
+    if (!workers) {
+        workers = new Array(poolSize).fill(null);
+    }
+    for (let i = 0; i < count; i++) {
+        if (!workers[i]) {
+            workers[i] = spawnWorker(i);
+        }
+    }
+    return workers.slice(0, count);
+}
+
+/**
+ * Run one range of pair hashing on a worker
+ * @param {object} entry - Pool entry from getWorkers
+ * @param {object} task - Shared buffers and pair range
+ * @returns {Promise<void>} Settles on the worker's reply for this task's id
+ */
+function runTask(entry, task) {
+    return new Promise((resolve, reject) => {
+        const id = nextTaskId++;
+        entry.pending.set(id, { resolve, reject });
+        entry.worker.ref(); // keep the process alive while a task is outstanding
+        entry.worker.postMessage({ id, ...task });
+    });
+}
+
+/**
+ * Whether a level of the given size should be hashed on the worker pool
+ * @param {number} nodeCount - Number of nodes in the child level
+ * @param {number} [maxWorkers=poolSize] - Cap on worker threads (e.g. from --jobs)
+ * @returns {boolean}
+ */
+function shouldParallelize(nodeCount, maxWorkers = poolSize) {
+    return Math.min(maxWorkers, poolSize) > 1 && nodeCount >= PARALLEL_THRESHOLD;
+}
+
+/**
+ * Allocate a buffer that can be shared with the worker pool without copying
+ * @param {number} size - Size in bytes
+ * @returns {Buffer}
+ */
+function allocShared(size) {
+    return Buffer.from(new SharedArrayBuffer(size));
+}
+
+/**
+ * Hash a packed level across the worker pool, one contiguous chunk per worker
+ * @param {Buffer} children - Packed child digests backed by a SharedArrayBuffer
+ * @param {Buffer} parents - Output buffer backed by a SharedArrayBuffer
+ * @param {number} [maxWorkers=poolSize] - Cap on worker threads (e.g. from --jobs)
+ * @returns {Promise<Buffer>} The filled parents buffer
+ */
+async function hashPairsParallel(children, parents, maxWorkers = poolSize) {
+    if (!(children.buffer instanceof SharedArrayBuffer && parents.buffer instanceof SharedArrayBuffer)) {
+        return hashPairs(children, parents);
+    }
+
+    const count = children.length / 64;
+    const pool = getWorkers(Math.max(1, Math.min(maxWorkers, poolSize)));
+    const chunk = Math.ceil(count / pool.length);
+    const tasks = [];
+
+    for (let w = 0, start = 0; start < count; w++, start += chunk) {
+        tasks.push(runTask(pool[w], {
+            children: children.buffer,
+            childOffset: children.byteOffset,
+            parents: parents.buffer,
+            parentOffset: parents.byteOffset,
+            start,
+            end: Math.min(start + chunk, count)
+        }));
+    }
+
+    await Promise.all(tasks);
+    return parents;
+}
+
+module.exports = {
+    poolSize,
+    shouldParallelize,
+    allocShared,
+    hashPairsParallel
+};
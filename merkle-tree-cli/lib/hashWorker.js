@@ -0,0 +1,10 @@
+const { parentPort } = require('worker_threads');
+const { hashPairs } = require('./hashing');
+
+// Hashes a contiguous range of sibling pairs from a shared packed level
+parentPort.on('message', ({ id, children, childOffset, parents, parentOffset, start, end }) => {
+    const input = Buffer.from(children, childOffset + start * 64, (end - start) * 64);
+    const output = Buffer.from(parents, parentOffset + start * 32, (end - start) * 32);
+    hashPairs(input, output);
+    parentPort.postMessage({ id });
+});
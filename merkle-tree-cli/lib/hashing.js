@@ -1,38 +1,111 @@
 const crypto = require('crypto');
 const fs = require('fs');
-const { promisify } = require('util');
+const path = require('path');
 
-const read = promisify(fs.read);
+// Large reads keep syscall overhead low and give OpenSSL long runs to hash
+const CHUNK_SIZE = 1024 * 1024;
+const WHOLE_FILE_LIMIT = BigInt(64 * 1024);
+
+// One-shot digest (Node >= 20.12) avoids allocating a Hash object per call.
+// OpenSSL selects its SHA-NI / AVX2 kernel from CPUID at startup, so parent
+// hashing gets the hardware path without a native addon of our own.
+const sha256 = typeof crypto.hash === 'function'
+    ? data => crypto.hash('sha256', data, 'buffer')
+    : data => crypto.createHash('sha256').update(data).digest();
 
 /**
  * Hash data using SHA-256
- * @param {string} data - Input data to hash
- * @returns {string} Hexadecimal hash string
+ * @param {string|Buffer} data - Input data to hash
+ * @returns {Buffer} Raw 32-byte digest
  */
 function hashData(data) {
-    return crypto.createHash('sha256').update(data).digest('hex');
+    return sha256(data);
+}
+
+/**
+ * Hash every 64-byte sibling pair of a packed level in one pass
+ * @param {Buffer} children - Concatenated child digests, two per parent
+ * @param {Buffer} [parents] - Output buffer for the parent digests
+ * @returns {Buffer} Concatenated 32-byte parent digests
+ */
+function hashPairs(children, parents = Buffer.allocUnsafe(children.length / 2)) {
+    const count = children.length / 64;
+    for (let i = 0; i < count; i++) {
+        sha256(children.subarray(i * 64, i * 64 + 64)).copy(parents, i * 32);
+    }
+    return parents;
+}
+
+/**
+ * JSON.stringify replacer that hex-encodes raw digests
+ * @param {string} key - Property key
+ * @param {*} value - Property value (after toJSON)
+ * @returns {*} Hex string for Buffers, value otherwise
+ */
+function hashReplacer(key, value) {
+    const raw = this[key];
+    return Buffer.isBuffer(raw) ? raw.toString('hex') : value;
 }
 
 /**
  * Hash file contents using SHA-256
  * @param {string} filePath - Path to file
- * @returns {Promise<string>} Hexadecimal hash string
+ * @param {Map} [hashCache] - Opt-in cache of resolved path -> { mtimeNs, size, digest },
+ *     scoped by the caller (e.g. one CLI run) so a build and its proof share digests
+ * @returns {Promise<Buffer>} Raw 32-byte digest
  */
-async function hashFile(filePath) {
+async function hashFile(filePath, hashCache) {
+    const stats = await fs.promises.stat(filePath, { bigint: true });
+    if (!hashCache) {
+        return hashFileContents(filePath, stats);
+    }
+
+    // Reuse the digest if the file is unchanged since it was hashed in this scope
+    const key = path.resolve(filePath);
+    const cached = hashCache.get(key);
+    if (cached && cached.mtimeNs === stats.mtimeNs && cached.size === stats.size) {
+        return cached.digest;
+    }
+
+    const digest = await hashFileContents(filePath, stats);
+    if (stats.isFile()) {
+        hashCache.set(key, { mtimeNs: stats.mtimeNs, size: stats.size, digest });
+    }
+    return digest;
+}
+
+/**
+ * Read and hash a file without consulting the cache
+ * @param {string} filePath - Path to file
+ * @param {fs.BigIntStats} stats - Stats of the file
+ * @returns {Promise<Buffer>} Raw 32-byte digest
+ */
+async function hashFileContents(filePath, stats) {
     const fd = await fs.promises.open(filePath, 'r');
-    const hash = crypto.createHash('sha256');
-    const buffer = Buffer.alloc(4096);
     
     try {
-        let bytesRead;
-        do {
-            ({ bytesRead } = await read(fd.fd, buffer, 0, 4096, null));
-            if (bytesRead > 0) {
-                hash.update(buffer.slice(0, bytesRead));
-            }
-        } while (bytesRead > 0);
+        // Small regular files: one read, one digest
+        if (stats.isFile() && stats.size <= WHOLE_FILE_LIMIT) {
+            return sha256(await fd.readFile());
+        }
+
+        // Double-buffered: the next chunk is read on the libuv pool while
+        // the current one is hashed on this thread
+        const hash = crypto.createHash('sha256');
+        const buffers = [Buffer.allocUnsafe(CHUNK_SIZE), Buffer.allocUnsafe(CHUNK_SIZE)];
+        let current = 0;
+        let pending = fd.read(buffers[current], 0, CHUNK_SIZE, null);
+
+        for (;;) {
+            const { bytesRead } = await pending;
+            if (bytesRead === 0) break;
+
+            pending = fd.read(buffers[current ^ 1], 0, CHUNK_SIZE, null);
+            hash.update(buffers[current].subarray(0, bytesRead));
+            current ^= 1;
+        }
         
-        return hash.digest('hex');
+        return hash.digest();
     } finally {
         await fd.close();
     }
@@ -40,5 +113,7 @@ async function hashFile(filePath) {
 
 module.exports = {
     hashData,
-    hashFile
+    hashPairs,
+    hashFile,
+    hashReplacer
 };
\ No newline at end of file
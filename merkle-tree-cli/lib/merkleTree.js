@@ -1,55 +1,239 @@
-const { hashData, hashFile } = require('./hashing');
+const { hashData, hashPairs, hashFile } = require('./hashing');
+const { poolSize, shouldParallelize, allocShared, hashPairsParallel } = require('./hashPool');
+
+// Data blocks inspected to decide whether memoizing leaf digests pays off
+const DEDUP_SAMPLE_SIZE = 1024;
+
+// Characters of JSON text buffered before each write to the output stream
+const JSON_CHUNK_SIZE = 64 * 1024;
+
+/**
+ * Map items through an async function with bounded concurrency
+ * @param {Array} items - Input items
+ * @param {number} limit - Maximum number of in-flight calls
+ * @param {Function} fn - Async mapper
+ * @returns {Promise<Array>} Results in input order
+ */
+async function mapConcurrent(items, limit, fn) {
+    const results = new Array(items.length);
+    let next = 0;
+
+    async function worker() {
+        while (next < items.length) {
+            const i = next++;
+            results[i] = await fn(items[i]);
+        }
+    }
+
+    const workers = Array.from({ length: Math.min(limit, items.length) }, worker);
+    await Promise.all(workers);
+    return results;
+}
+
+/**
+ * Map a block to a memo key. Strings and raw bytes use separate maps, since
+ * 'é' and <Buffer e9> share a latin1 key but not a digest.
+ * @param {string|Buffer} item - Data block
+ * @param {Map|Set} strings - Collection for string blocks
+ * @param {Map|Set} bytes - Collection for Buffer blocks
+ * @returns {[Map|Set, string]} Collection and key for the block
+ */
+function blockSlot(item, strings, bytes) {
+    return Buffer.isBuffer(item) ? [bytes, item.toString('latin1')] : [strings, item];
+}
+
+/**
+ * Check an evenly spaced sample of blocks for repeats
+ * @param {Array<string|Buffer>} items - Data blocks
+ * @returns {boolean} True if the sample contains a duplicate
+ */
+function sampleHasRepeats(items) {
+    const stride = Math.max(1, Math.floor(items.length / DEDUP_SAMPLE_SIZE));
+    const strings = new Set();
+    const bytes = new Set();
+
+    for (let i = 0; i < items.length; i += stride) {
+        const [seen, key] = blockSlot(items[i], strings, bytes);
+        if (seen.has(key)) return true;
+        seen.add(key);
+    }
+    return false;
+}
+
+/**
+ * Hash data blocks. When a sample shows repeats (e.g. log lines), each
+ * distinct block is hashed only once; otherwise the memo is skipped, since
+ * building keys for unique blocks costs more than it saves.
+ * @param {Array<string|Buffer>} items - Data blocks
+ * @returns {Buffer[]} Leaf digests in input order
+ */
+function hashBlocks(items) {
+    if (!sampleHasRepeats(items)) {
+        return items.map(item => hashData(item));
+    }
+
+    const strings = new Map();
+    const bytes = new Map();
+
+    return items.map(item => {
+        const [seen, key] = blockSlot(item, strings, bytes);
+        let hash = seen.get(key);
+        if (hash === undefined) {
+            hash = hashData(item);
+            seen.set(key, hash);
+        }
+        return hash;
+    });
+}
+
+/**
+ * Allocate a level buffer with room to duplicate an odd trailing digest
+ * @param {number} nodeCount - Number of digests in the level
+ * @param {boolean} shared - Whether the worker pool needs access to it
+ * @returns {Buffer}
+ */
+function allocLevel(nodeCount, shared) {
+    const size = Math.ceil(nodeCount / 2) * 64;
+    return shared ? allocShared(size) : Buffer.allocUnsafe(size);
+}
+
+/**
+ * Get the digest at an index of a packed level
+ * @param {Buffer} level - Concatenated 32-byte digests
+ * @param {number} index - Node index within the level
+ * @returns {Buffer} 32-byte view into the level
+ */
+function digestAt(level, index) {
+    return level.subarray(index * 32, index * 32 + 32);
+}
 
 /**
  * Build a Merkle Tree from data blocks or files
- * @param {string[]} items - Array of data blocks or file paths
+ * @param {Array<string|Buffer>} items - Array of data blocks or file paths
  * @param {boolean} [isFilePaths=false] - Whether items are file paths
- * @returns {Promise<{root: object, treeLevels: array[]}>}
+ * @param {object} [options] - Build options
+ * @param {number} [options.jobs] - Files hashed concurrently, and cap on worker threads
+ *     for large levels (defaults to available CPUs)
+ * @param {Map} [options.hashCache] - Opt-in file digest cache shared with later
+ *     proof calls (see hashFile)
+ * @param {boolean} [options.retainLevels=true] - Keep every level (needed for proofs and
+ *     tree output); when false only the root is kept and treeLevels is null
+ * @returns {Promise<{rootHash: Buffer, treeLevels: Buffer[]|null, leafCount: number}>}
  */
-async function buildMerkleTree(items, isFilePaths = false) {
+async function buildMerkleTree(items, isFilePaths = false, options = {}) {
     if (!items || items.length === 0) {
-        return { root: null, treeLevels: null };
+        return { rootHash: null, treeLevels: null, leafCount: 0 };
     }
 
-    // Create leaf nodes
-    const nodes = [];
-    for (const item of items) {
-        const hash = isFilePaths ? await hashFile(item) : hashData(item);
-        nodes.push({
-            hash,
-            [isFilePaths ? 'filePath' : 'data']: item
-        });
-    }
+    const { jobs = poolSize, retainLevels = true, hashCache } = options;
+
+    // Hash leaves; file reads overlap across up to `jobs` files
+    const hashes = isFilePaths
+        ? await mapConcurrent(items, Math.max(1, jobs), item => hashFile(item, hashCache))
+        : hashBlocks(items);
+
+    // Each level is one contiguous buffer of 32-byte digests
+    let count = items.length;
+    let level = allocLevel(count, shouldParallelize(count, jobs));
+    hashes.forEach((hash, i) => hash.copy(level, i * 32));
+
+    // Without retention each level is dropped once its parents are hashed
+    const treeLevels = retainLevels ? [level.subarray(0, count * 32)] : null;
+
+    while (count > 1) {
+        const parentCount = Math.ceil(count / 2);
+        const parallel = shouldParallelize(count, jobs);
+
+        // An odd last node is paired with itself
+        if (count % 2) {
+            level.copy(level, count * 32, (count - 1) * 32, count * 32);
+        }
+
+        // Large levels are split across the worker pool via shared memory
+        const next = allocLevel(parentCount, parallel || shouldParallelize(parentCount, jobs));
+        const parents = next.subarray(0, parentCount * 32);
+        if (parallel) {
+            await hashPairsParallel(level, parents, jobs);
+        } else {
+            hashPairs(level, parents);
+        }
 
-    const treeLevels = [nodes];
-    let currentLevel = nodes;
-
-    while (currentLevel.length > 1) {
-        const nextLevel = [];
-        
-        for (let i = 0; i < currentLevel.length; i += 2) {
-            const left = currentLevel[i];
-            const right = (i + 1 < currentLevel.length) ? currentLevel[i + 1] : currentLevel[i];
-            const combinedHash = hashData(left.hash + right.hash);
-            
-            nextLevel.push({
-                hash: combinedHash,
-                left,
-                right
-            });
+        if (retainLevels) {
+            treeLevels.push(parents);
         }
-        
-        treeLevels.push(nextLevel);
-        currentLevel = nextLevel;
+        level = next;
+        count = parentCount;
     }
     
     return { 
-        root: currentLevel[0], 
+        rootHash: digestAt(level, 0), 
         treeLevels,
         leafCount: items.length
     };
 }
 
+/**
+ * Serialize the tree from packed levels as JSON text, yielding it in chunks.
+ * Walks depth-first with an explicit stack, so neither the nested node objects
+ * nor the full JSON string are ever built. Output matches JSON.stringify of the
+ * nested tree ({hash, left, right} parents, {hash, data|filePath} leaves, an odd
+ * last node repeated as its own sibling) with null or 2-space indentation.
+ * @param {Buffer[]} treeLevels - Packed levels from buildMerkleTree
+ * @param {Array<string|Buffer>} items - Original data blocks or file paths
+ * @param {boolean} [isFilePaths=false] - Whether items are file paths
+ * @param {boolean} [pretty=false] - Indent with two spaces
+ * @yields {string} JSON text chunks of roughly JSON_CHUNK_SIZE characters
+ */
+function* treeJsonChunks(treeLevels, items, isFilePaths = false, pretty = false) {
+    const nl = pretty ? '\n' : '';
+    const colon = pretty ? ': ' : ':';
+    const indent = depth => (pretty ? '  '.repeat(depth) : '');
+    const itemKey = isFilePaths ? '"filePath"' : '"data"';
+
+    // Entries are either literal text or a [level, index, depth] node reference
+    const stack = [[treeLevels.length - 1, 0, 0]];
+    let out = '';
+
+    while (stack.length > 0) {
+        const entry = stack.pop();
+
+        if (typeof entry === 'string') {
+            out += entry;
+        } else {
+            const [k, i, depth] = entry;
+            const inner = indent(depth + 1);
+            out += `{${nl}${inner}"hash"${colon}"${digestAt(treeLevels[k], i).toString('hex')}",${nl}${inner}`;
+
+            if (k === 0) {
+                const item = Buffer.isBuffer(items[i]) ? items[i].toString('utf8') : items[i];
+                out += `${itemKey}${colon}${JSON.stringify(item)}${nl}${indent(depth)}}`;
+            } else {
+                // An odd last child is its own sibling
+                const childCount = treeLevels[k - 1].length / 32;
+                const right = Math.min(2 * i + 1, childCount - 1);
+                out += `"left"${colon}`;
+                stack.push(
+                    `${nl}${indent(depth)}}`,
+                    [k - 1, right, depth + 1],
+                    `,${nl}${inner}"right"${colon}`,
+                    [k - 1, 2 * i, depth + 1]
+                );
+            }
+        }
+
+        if (out.length >= JSON_CHUNK_SIZE) {
+            yield out;
+            out = '';
+        }
+    }
+
+    if (out.length > 0) {
+        yield out;
+    }
+}
+
 module.exports = {
-    buildMerkleTree
-};
\ No newline at end of file
+    buildMerkleTree,
+    treeJsonChunks,
+    digestAt
+};
@@ -1,36 +1,42 @@
 const path = require('path');
 const { hashData, hashFile } = require('./hashing');
+const { digestAt } = require('./merkleTree');
+
+/**
+ * Normalize a hash to its raw digest form
+ * @param {Buffer|string} hash - Raw digest or hex string (e.g. from saved JSON)
+ * @returns {Buffer} Raw digest
+ */
+function toDigest(hash) {
+    return Buffer.isBuffer(hash) ? hash : Buffer.from(hash, 'hex');
+}
 
 /**
  * Generate Merkle proof for an item
  * @param {string} target - Target item to prove
- * @param {string[]} items - Original items
- * @param {array[]} treeLevels - Merkle tree levels
+ * @param {Array<string|Buffer>} items - Original items
+ * @param {Buffer[]} treeLevels - Packed Merkle tree levels
  * @param {boolean} [isFilePaths=false] - Whether items are file paths
+ * @param {Map} [hashCache] - Opt-in file digest cache (see hashFile)
  * @returns {Promise<object[]>} Merkle proof path
  */
-async function generateMerkleProof(target, items, treeLevels, isFilePaths = false) {
+async function generateMerkleProof(target, items, treeLevels, isFilePaths = false, hashCache) {
     if (!items || items.length === 0) return null;
 
     // Get the target hash
-    const targetHash = isFilePaths ? await hashFile(target) : hashData(target);
+    const targetHash = isFilePaths ? await hashFile(target, hashCache) : hashData(target);
     
-    // Find index using hash comparison instead of path comparison
-    // const index = items.findIndex(async item => {
-    //     const itemHash = isFilePaths ? await hashFile(item) : hashData(item);
-    //     return itemHash === targetHash;
-    // });
-
+    // Locate the leaf by scanning the digests already in the tree (no rehashing,
+    // no per-leaf allocation); the first occurrence wins
+    const leaves = treeLevels[0];
     let index = -1;
     for (let i = 0; i < items.length; i++) {
-        const itemHash = isFilePaths ? await hashFile(items[i]) : hashData(items[i]);
-        if (itemHash === targetHash) {
+        if (leaves.compare(targetHash, 0, 32, i * 32, i * 32 + 32) === 0) {
             index = i;
             break;
         }
     }
 
-
     if (index === -1) return null;
 
     const proof = [];
@@ -41,14 +47,14 @@ async function generateMerkleProof(target, items, treeLevels, isFilePaths = fals
         const isRightNode = currentIndex % 2;
         const siblingIndex = isRightNode ? currentIndex - 1 : currentIndex + 1;
         
-        if (siblingIndex < currentLevel.length) {
+        if (siblingIndex < currentLevel.length / 32) {
             proof.push({
-                hash: currentLevel[siblingIndex]["hash"],
+                hash: digestAt(currentLevel, siblingIndex),
                 position: isRightNode ? 'left' : 'right'
             });
         } else {
             proof.push({
-                hash: currentLevel[currentIndex]["hash"],
+                hash: digestAt(currentLevel, currentIndex),
                 position: isRightNode ? 'left' : 'right'
             });
         }
@@ -62,24 +68,38 @@ async function generateMerkleProof(target, items, treeLevels, isFilePaths = fals
 /**
  * Verify Merkle proof
  * @param {string} target - Target item to verify
- * @param {object[]} proof - Merkle proof path
- * @param {string} merkleRoot - Expected root hash
+ * @param {object[]} proof - Merkle proof path (raw or hex-encoded hashes)
+ * @param {Buffer|string} merkleRoot - Expected root hash (raw or hex)
  * @param {boolean} [isFilePath=false] - Whether target is a file path
+ * @param {Map} [hashCache] - Opt-in file digest cache (see hashFile)
  * @returns {Promise<boolean>} True if valid
  */
-async function verifyMerkleProof(target, proof, merkleRoot, isFilePath = false) {
+async function verifyMerkleProof(target, proof, merkleRoot, isFilePath = false, hashCache) {
     try {
-        const targetHash = isFilePath ? await hashFile(target) : hashData(target);
+        const targetHash = isFilePath ? await hashFile(target, hashCache) : hashData(target);
         let currentHash = targetHash;
+
+        // Reuse one 64-byte buffer for every sibling pair on the path;
+        // each step overwrites all of it
+        const pair = Buffer.allocUnsafe(64);
         
         for (const step of proof) {
-            const { hash, position } = step;
-            currentHash = position === 'left' 
-                ? hashData(hash + currentHash)
-                : hashData(currentHash + hash);
+            const { position } = step;
+            const hash = toDigest(step.hash);
+            if (hash.length !== 32) {
+                return false; // malformed step, e.g. bad hex from saved JSON
+            }
+            if (position === 'left') {
+                hash.copy(pair, 0);
+                currentHash.copy(pair, 32);
+            } else {
+                currentHash.copy(pair, 0);
+                hash.copy(pair, 32);
+            }
+            currentHash = hashData(pair);
         }
         
-        return currentHash === merkleRoot;
+        return currentHash.equals(toDigest(merkleRoot));
     } catch (error) {
         console.error("Verification error:", error);
         return false;